@@ -3,10 +3,259 @@
 import hashlib
 import json
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
 import pyarrow.parquet as pq
 
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+__all__ = [
+    "Reader",
+    "drop_redundant",
+    "drop_unchanged",
+    "get_entity_names",
+    "get_row_hash",
+    "read_csv_folder",
+    "read_parquet_folder",
+    "read_snapshots",
+    "snapshot_records",
+    "write_snapshot",
+]
+
+# Arrow to pandas types mapping, same as read_parquet(use_nullable_dtypes=True)
+_NULLABLE_TYPES = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+    pa.uint8(): pd.UInt8Dtype(),
+    pa.uint16(): pd.UInt16Dtype(),
+    pa.uint32(): pd.UInt32Dtype(),
+    pa.uint64(): pd.UInt64Dtype(),
+    pa.bool_(): pd.BooleanDtype(),
+    pa.string(): pd.StringDtype(),
+    pa.float32(): pd.Float32Dtype(),
+    pa.float64(): pd.Float64Dtype(),
+}
+
+# Default NA values of pandas read_csv, "None" is one since pandas 2.0
+_NA_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "n/a",
+    "nan",
+    "null",
+]
+if int(pd.__version__.split(".")[0]) >= 2:
+    _NA_VALUES.append("None")
+
+# File name without the extension and the last "-" suffix, same as rsplit-ing them
+_ENTITY_NAME_RE = re.compile(r"(?P<entity>.*?)(?:-[^-]*)?(?:\.[^.]*)?\Z", re.DOTALL)
+
+
+def get_entity_names(files):
+    """Get the entity names from the file names.
+
+    Notes
+    -----
+    The entity name is the file name without the extension and the last ``-``
+    suffix, for example; Account-20200811T121507.csv is for an entity called
+    ``Account``.
+
+    Parameters
+    ----------
+    files: list
+        List of file paths.
+
+    Returns
+    -------
+    return: list
+        List with the entity name of every file.
+
+    """
+    return [
+        _ENTITY_NAME_RE.match(os.path.basename(file)).group("entity") for file in files
+    ]
+
+
+def _to_arrow_type(dtype):
+    """Get the pyarrow type used to parse a column with the given pandas dtype.
+
+    Parameters
+    ----------
+    dtype: str, type, np.dtype or pandas ExtensionDtype
+        The pandas dtype.
+
+    Returns
+    -------
+    return: pa.DataType
+        The pyarrow type, strings for object columns.
+
+    """
+    dtype = pd.api.types.pandas_dtype(dtype)
+    if dtype == object:
+        return pa.string()
+    return pa.from_numpy_dtype(getattr(dtype, "numpy_dtype", dtype))
+
+
+def _read_csv(path, index_col=None, converters=None, dtype=None, parse_dates=None):
+    """Read a CSV file into a dataframe using pyarrow's multithreaded reader.
+
+    Notes
+    -----
+    The result matches pandas read_csv: dates and times are kept as strings and
+    pandas' default NA values are read as NaN. Files with converters, dtypes
+    without a pyarrow equivalent, blank or duplicated headers, no rows or integers
+    that don't fit in an int64 are read with pandas read_csv. Floats are parsed
+    with correct rounding, so values with 17 significant digits can differ in the
+    last digit from pandas' default float parser.
+
+    Parameters
+    ----------
+    path: str
+        The CSV file path.
+    index_col: int, str, list
+        Column(s) to use as the index of the dataframe.
+    converters: dict
+        Dict of functions for converting values in certain columns, if set the file
+        is read with pandas.
+    dtype: dict
+        Dict with the pandas dtype of the columns.
+    parse_dates: list
+        Columns to be parsed as dates.
+
+    Returns
+    -------
+    return: pd.DataFrame
+        A pandas dataframe with the file data.
+
+    """
+    dtype = dtype or {}
+    parse_dates = parse_dates or []
+    pandas_kwargs = dict(
+        index_col=index_col,
+        converters=converters,
+        dtype=dtype or None,
+        parse_dates=parse_dates or None,
+    )
+    if converters:
+        return pd.read_csv(path, **pandas_kwargs)
+
+    try:
+        column_types = {
+            col: _to_arrow_type(col_dtype) for col, col_dtype in dtype.items()
+        }
+        # Dates are parsed by pandas, same as read_csv(parse_dates=...)
+        column_types.update({col: pa.string() for col in parse_dates})
+        table = _read_csv_table(path, column_types)
+
+        # pandas renames blank and duplicated headers, and reads the columns of
+        # files without rows as objects
+        names = table.column_names
+        if not table.num_rows or "" in names or len(set(names)) < len(names):
+            return pd.read_csv(path, **pandas_kwargs)
+
+        # pandas doesn't infer dates or times, so they are read again as strings,
+        # and empty columns are read as floats instead of nulls
+        retyped = {
+            field.name: (
+                pa.string() if pa.types.is_temporal(field.type) else pa.float64()
+            )
+            for field in table.schema
+            if (pa.types.is_temporal(field.type) or pa.types.is_null(field.type))
+            and field.name not in column_types
+        }
+        if retyped:
+            table = _read_csv_table(path, {**column_types, **retyped})
+
+        # Integers that don't fit in an int64 are read as floats by pyarrow, pandas
+        # reads them as uint64 or strings without losing precision
+        if any(
+            pa.types.is_floating(field.type)
+            and field.name not in column_types
+            and _is_int_overflow(table.column(field.name))
+            for field in table.schema
+        ):
+            return pd.read_csv(path, **pandas_kwargs)
+
+        has_nulls = [name for name in names if table.column(name).null_count]
+        df = table.to_pandas(self_destruct=True)
+        # Missing strings and booleans are NaN in pandas instead of None
+        for col in has_nulls:
+            if df[col].dtype == object:
+                values = df[col].to_numpy(copy=True)
+                values[pd.isna(values)] = np.nan
+                df[col] = values
+        extension_dtypes = {
+            col: col_dtype
+            for col, col_dtype in dtype.items()
+            if col in df.columns
+            and isinstance(
+                pd.api.types.pandas_dtype(col_dtype), pd.api.extensions.ExtensionDtype
+            )
+        }
+        if extension_dtypes:
+            df = df.astype(extension_dtypes)
+    except (pa.ArrowException, ValueError, TypeError):
+        return pd.read_csv(path, **pandas_kwargs)
+
+    for col in parse_dates:
+        # Columns that can't be parsed are kept as strings, like read_csv does
+        try:
+            df[col] = pd.to_datetime(df[col])
+        except (ValueError, TypeError):
+            pass
+    if index_col is not None and index_col is not False:
+        index = index_col if isinstance(index_col, list) else [index_col]
+        index = [df.columns[col] if isinstance(col, int) else col for col in index]
+        df = df.set_index(index if isinstance(index_col, list) else index[0])
+    return df
+
+
+def _is_int_overflow(column):
+    """Check if a float column only has integers and some don't fit in an int64."""
+    abs_max = pc.max(pc.abs(column)).as_py()
+    if abs_max is None or abs_max < 2**63:
+        return False
+    return pc.all(pc.equal(column, pc.floor(column))).as_py()
+
+
+def _read_csv_table(path, column_types):
+    """Read a CSV file into a pyarrow table with pandas' NA values."""
+    return pcsv.read_csv(
+        path,
+        read_options=pcsv.ReadOptions(use_threads=True, block_size=8 << 20),
+        parse_options=pcsv.ParseOptions(newlines_in_values=True),
+        convert_options=pcsv.ConvertOptions(
+            column_types=column_types,
+            null_values=_NA_VALUES,
+            strings_can_be_null=True,
+        ),
+    )
+
 
 def read_csv_folder(path, converters={}, index_cols={}, ignore=[]):
     """Read a set of CSV files in a folder using read_csv().
@@ -52,36 +301,108 @@ def read_csv_folder(path, converters={}, index_cols={}, ignore=[]):
     """
     is_directory = os.path.isdir(path)
     all_files = []
-    results = {}
+    entity_files = {}
     if is_directory:
-        for entry in os.listdir(path):
-            if os.path.isfile(os.path.join(path, entry)) and os.path.join(
-                path, entry
-            ).endswith(".csv"):
-                all_files.append(os.path.join(path, entry))
-
+        with os.scandir(path) as entries:
+            all_files = [
+                entry.path
+                for entry in entries
+                if entry.is_file() and entry.name.endswith(".csv")
+            ]
     else:
         all_files.append(path)
 
-    for file in all_files:
-        split_path = file.split("/")
-        entity_type = split_path[len(split_path) - 1].rsplit(".csv", 1)[0]
+    for file, entity_type in zip(all_files, get_entity_names(all_files)):
+        if entity_type not in entity_files and entity_type not in ignore:
+            entity_files[entity_type] = file
+
+    if not entity_files:
+        return entity_files
+
+    # The parsers release the GIL, so the files are read concurrently
+    with ThreadPoolExecutor(max_workers=min(8, len(entity_files))) as executor:
+        data = executor.map(
+            lambda entity: _read_csv(
+                entity_files[entity],
+                index_col=index_cols.get(entity),
+                converters=converters.get(entity),
+            ),
+            entity_files,
+        )
+        return dict(zip(entity_files, data))
 
-        if "-" in entity_type:
-            entity_type = entity_type.rsplit("-", 1)[0]
 
-        if entity_type not in results and entity_type not in ignore:
-            # print(f"Reading file of type {entity_type} in the data file {file}")
-            results[entity_type] = pd.read_csv(
-                file,
-                index_col=index_cols.get(entity_type),
-                converters=converters.get(entity_type),
-            )
+def _open_parquet(path, **kwargs):
+    """Open a parquet file with buffered reads.
+
+    Parameters
+    ----------
+    path: str, pa.NativeFile
+        The parquet file path, or an opened file.
+    **kwargs:
+        Additional arguments that are passed to pyarrow ParquetFile.
+
+    Returns
+    -------
+    return: pq.ParquetFile
+        The opened parquet file.
+
+    """
+    # Pre-buffering coalesces the reads of consecutive column chunks
+    return pq.ParquetFile(path, buffer_size=1 << 20, pre_buffer=True, **kwargs)
+
+
+def _read_parquet(path, columns=None, **kwargs):
+    """Read a parquet file into a dataframe with nullable dtypes.
+
+    Parameters
+    ----------
+    path: str, pq.ParquetFile
+        The parquet file path, or an already opened parquet file.
+    columns: list
+        If not None, only these columns will be read from the file.
+    **kwargs:
+        Additional arguments, like filters, that are passed to pandas read_parquet.
+        Only supported when path is a str.
 
-    return results
+    Returns
+    -------
+    return: pd.DataFrame
+        A pandas dataframe with the file data.
+
+    """
+    if kwargs:
+        # Read options like filters or engine are only supported by pandas
+        return pd.read_parquet(
+            path, columns=columns, use_nullable_dtypes=True, **kwargs
+        )
+    if isinstance(path, pq.ParquetFile):
+        return _parquet_to_pandas(path, columns)
+    # ParquetFile can only be closed since pyarrow 10, so the file is opened here
+    with pa.OSFile(path) as source:
+        return _parquet_to_pandas(_open_parquet(source), columns)
+
+
+def _parquet_to_pandas(parquet_file, columns=None):
+    """Read an opened parquet file into a dataframe with nullable dtypes."""
+    batches = list(
+        parquet_file.iter_batches(
+            batch_size=65536,
+            columns=columns,
+            use_threads=True,
+            use_pandas_metadata=True,
+        )
+    )
+    if batches:
+        table = pa.Table.from_batches(batches)
+    else:
+        table = parquet_file.read(columns=columns, use_pandas_metadata=True)
+    return table.to_pandas(
+        self_destruct=True, split_blocks=True, types_mapper=_NULLABLE_TYPES.get
+    )
 
 
-def read_parquet_folder(path, ignore=[]):
+def read_parquet_folder(path, ignore=[], columns={}):
     """Read a set of parquet files in a folder using read_parquet().
 
     Notes
@@ -97,6 +418,9 @@ def read_parquet_folder(path, ignore=[]):
         The folder directory
     ignore: list
         List of files to ignore
+    columns: dict
+        A dictionary with an array of columns to read, the key of the dictionary is
+        the name of the entity. All columns are read for entities not in it.
 
     Returns
     -------
@@ -111,31 +435,34 @@ def read_parquet_folder(path, ignore=[]):
     """
     is_directory = os.path.isdir(path)
     all_files = []
-    results = {}
+    entity_files = {}
     if is_directory:
-        for entry in os.listdir(path):
-            if os.path.isfile(os.path.join(path, entry)) and os.path.join(
-                path, entry
-            ).endswith(".parquet"):
-                all_files.append(os.path.join(path, entry))
-
+        with os.scandir(path) as entries:
+            all_files = [
+                entry.path
+                for entry in entries
+                if entry.is_file() and entry.name.endswith(".parquet")
+            ]
     else:
         all_files.append(path)
 
-    for file in all_files:
-        split_path = file.split("/")
-        entity_type = split_path[len(split_path) - 1].rsplit(".parquet", 1)[0]
+    for file, entity_type in zip(all_files, get_entity_names(all_files)):
+        if entity_type not in entity_files and entity_type not in ignore:
+            entity_files[entity_type] = file
 
-        if "-" in entity_type:
-            entity_type = entity_type.rsplit("-", 1)[0]
+    if not entity_files:
+        return entity_files
 
-        if entity_type not in results and entity_type not in ignore:
-            results[entity_type] = pd.read_parquet(file, use_nullable_dtypes=True)
-
-    return results
+    # The parsers release the GIL, so the files are read concurrently
+    with ThreadPoolExecutor(max_workers=min(8, len(entity_files))) as executor:
+        data = executor.map(
+            lambda entity: _read_parquet(entity_files[entity], columns.get(entity)),
+            entity_files,
+        )
+        return dict(zip(entity_files, data))
 
 
-def read_snapshots(stream, snapshot_dir, **kwargs):
+def read_snapshots(stream, snapshot_dir, use_parquet=False, **kwargs):
     """Read a snapshot file.
 
     Parameters
@@ -144,6 +471,9 @@ def read_snapshots(stream, snapshot_dir, **kwargs):
         The name of the stream to extract the snapshots from.
     snapshot_dir: str
         The path for the directory where the snapshots are stored.
+    use_parquet: bool
+        Read the parquet snapshot instead of the CSV one, the other format is only
+        read if the snapshot doesn't exist.
     **kwargs:
         Additional arguments that are passed to pandas read_csv.
 
@@ -153,16 +483,51 @@ def read_snapshots(stream, snapshot_dir, **kwargs):
         A pandas dataframe with the snapshot data.
 
     """
-    # Read snapshot file if it exists
-    if os.path.isfile(f"{snapshot_dir}/{stream}.snapshot.csv"):
-        snapshot = pd.read_csv(f"{snapshot_dir}/{stream}.snapshot.csv", **kwargs)
+    parquet_file = f"{snapshot_dir}/{stream}.snapshot.parquet"
+    csv_file = f"{snapshot_dir}/{stream}.snapshot.csv"
+    # Read snapshot file if it exists, in the same format it is written to
+    if os.path.isfile(parquet_file) and (use_parquet or not os.path.isfile(csv_file)):
+        snapshot = _read_parquet(parquet_file)
+    elif os.path.isfile(csv_file):
+        snapshot = pd.read_csv(csv_file, **kwargs)
     else:
         snapshot = None
     return snapshot
 
 
+def write_snapshot(df, stream, snapshot_dir, use_parquet=False):
+    """Write a snapshot file.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        DataFrame with the snapshot data.
+    stream: str
+        The name of the stream of the snapshots.
+    snapshot_dir: str
+        The path for the directory where the snapshots are stored.
+    use_parquet: bool
+        Write the snapshot as a snappy compressed parquet file instead of a CSV.
+
+    """
+    if use_parquet:
+        df.to_parquet(
+            f"{snapshot_dir}/{stream}.snapshot.parquet",
+            compression="snappy",
+            index=False,
+        )
+    else:
+        df.to_csv(f"{snapshot_dir}/{stream}.snapshot.csv", index=False)
+
+
 def snapshot_records(
-    stream_data, stream, snapshot_dir, pk="id", just_new=False, **kwargs
+    stream_data,
+    stream,
+    snapshot_dir,
+    pk="id",
+    just_new=False,
+    use_parquet=False,
+    **kwargs,
 ):
     """Update a snapshot file.
 
@@ -178,6 +543,8 @@ def snapshot_records(
         The primary key used for the snapshot.
     just_new: str
         Return just the input data if True, else returns the whole data
+    use_parquet: bool
+        Write the snapshot as a parquet file instead of a CSV.
     **kwargs:
         Additional arguments that are passed to pandas read_csv.
 
@@ -188,19 +555,44 @@ def snapshot_records(
 
     """
     # Read snapshot file if it exists
-    snapshot = read_snapshots(stream, snapshot_dir, **kwargs)
+    snapshot = read_snapshots(stream, snapshot_dir, use_parquet, **kwargs)
 
     # If snapshot file and stream data exist update the snapshot
     if stream_data is not None and snapshot is not None:
-        merged_data = pd.concat([snapshot, stream_data])
-        merged_data = merged_data.drop_duplicates(pk, keep="last")
-        merged_data.to_csv(f"{snapshot_dir}/{stream}.snapshot.csv", index=False)
+        snap = snapshot.set_index(pk)
+        is_duplicated = snap.index.duplicated(keep="last")
+        snap = snap[~is_duplicated]
+        new = stream_data.set_index(pk)
+        new = new[~new.index.duplicated(keep="last")]
+        new_columns = new.columns.difference(snap.columns, sort=False)
+        is_update = new.index.isin(snap.index)
+
+        # Skip rewriting the snapshot if the stream data doesn't change it
+        if not is_duplicated.any() and (
+            new.empty
+            or (
+                is_update.all()
+                and new_columns.empty
+                and _same_values(snap.loc[new.index], new.reindex(columns=snap.columns))
+            )
+        ):
+            merged_data = snapshot
+        else:
+            columns = snap.columns.append(new_columns)
+            snap = snap.reindex(columns=columns)
+
+            # Overwrite the updated records in place and append the new ones
+            snap.loc[new.index[is_update]] = new[is_update].reindex(columns=columns)
+            merged_data = pd.concat([snap, new[~is_update]]).reset_index()
+            # Keep the column order of the snapshot, with the primary key in place
+            merged_data = merged_data[snapshot.columns.append(new_columns)]
+            write_snapshot(merged_data, stream, snapshot_dir, use_parquet)
         if not just_new:
             return merged_data
 
     # If there is no snapshot file snapshots and return the new data
     if stream_data is not None and snapshot is None:
-        stream_data.to_csv(f"{snapshot_dir}/{stream}.snapshot.csv", index=False)
+        write_snapshot(stream_data, stream, snapshot_dir, use_parquet)
         return stream_data
 
     # If the new data is empty return snapshot
@@ -210,25 +602,173 @@ def snapshot_records(
         return snapshot
 
 
+def _same_values(left, right):
+    """Check if two frames with the same labels have the same values.
+
+    Unlike DataFrame.equals the dtypes don't need to match, so a snapshot read back
+    with nullable dtypes or dates as strings is equal to the stream data it was
+    written from.
+    """
+    for col in left.columns:
+        left_col, right_col = left[col], right[col]
+        # Dates are read back from CSV snapshots as strings
+        if (left_col.dtype.kind == "M") != (right_col.dtype.kind == "M"):
+            try:
+                left_col = pd.to_datetime(left_col)
+                right_col = pd.to_datetime(right_col)
+            except (ValueError, TypeError):
+                return False
+        left_values = left_col.to_numpy(dtype=object)
+        right_values = right_col.to_numpy(dtype=object)
+        is_null = pd.isna(left_values)
+        if not np.array_equal(is_null, pd.isna(right_values)):
+            return False
+        try:
+            if not (left_values[~is_null] == right_values[~is_null]).all():
+                return False
+        except (ValueError, TypeError):
+            return False
+    return True
+
+
+def _hash_numeric_rows(values):
+    """Hash the columns of a 2D uint64 array like pd.util.hash_pandas_object."""
+    n_cols, n_rows = values.shape
+    out = np.empty(n_rows, dtype=np.uint64)
+    for i in prange(n_rows):
+        h = np.uint64(0x345678)
+        mult = np.uint64(1000003)
+        for j in range(n_cols):
+            v = values[j, i]
+            v ^= v >> np.uint64(30)
+            v *= np.uint64(0xBF58476D1CE4E5B9)
+            v ^= v >> np.uint64(27)
+            v *= np.uint64(0x94D049BB133111EB)
+            v ^= v >> np.uint64(31)
+            h ^= v
+            h *= mult
+            mult += np.uint64(82520 + 2 * (n_cols - j))
+        out[i] = h + np.uint64(97531)
+    return out
+
+
+if njit is not None:
+    # Caching the compiled kernel avoids recompiling it in every process
+    _hash_numeric_rows = njit(parallel=True, cache=True)(_hash_numeric_rows)
+
+
+def _numeric_values(df):
+    """Get the columns of a numeric dataframe as a 2D uint64 array."""
+    values = np.empty((len(df.columns), len(df)), dtype=np.uint64)
+    for j in range(len(df.columns)):
+        column = df.iloc[:, j].to_numpy()
+        values[j] = column.view(f"u{column.dtype.itemsize}")
+    return values
+
+
+def _hash_rows(df):
+    """Hash the rows of a dataframe, same as hash_pandas_object(index=False).
+
+    Frames with only numeric columns are hashed in a single pass with numba when it
+    is installed. Object columns with unhashable values, like the lists and dicts of
+    nested JSON columns, are hashed as strings.
+    """
+    numeric = all(
+        isinstance(dtype, np.dtype) and dtype.kind in "biuf" and dtype.itemsize <= 8
+        for dtype in df.dtypes
+    )
+    if njit is None or not numeric or not len(df.columns):
+        try:
+            return pd.util.hash_pandas_object(df, index=False).to_numpy()
+        except TypeError:
+            unhashable = {}
+            for col in df.columns[(df.dtypes == object).to_numpy()]:
+                try:
+                    pd.util.hash_array(df[col].to_numpy())
+                except TypeError:
+                    unhashable[col] = str
+            df = df.astype(unhashable)
+            return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+    return _hash_numeric_rows(_numeric_values(df))
+
+
+def _get_digest(data):
+    """Get a 128 bit hex digest of the data.
+
+    Notes
+    -----
+    The digests are persisted, so the same algorithm is used in every environment.
+
+    Parameters
+    ----------
+    data: bytes
+        The data to create the digest from.
+
+    Returns
+    -------
+    return: str
+        A string with the hex digest.
+
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
 def get_row_hash(row):
-    """Update a snapshot file.
+    """Get the hash of a dataframe row, the same one drop_redundant stores.
+
+    Notes
+    -----
+    The hash depends on the column types. A row taken with ``df.iloc[i]`` from a
+    dataframe with only int and float columns is converted to floats by pandas, so
+    pass it as a one-row dataframe, ``df.iloc[[i]]``, to keep its types.
 
     Parameters
     ----------
-    row: pd.DataSeries
+    row: pd.Series, pd.DataFrame
         DataFrame row to create the hash from.
 
     Returns
     -------
-    return: str
-        A string with the hash for the row.
+    return: int
+        An unsigned 64 bit integer with the hash for the row.
 
     """
-    row_str = "".join(row.astype(str).values).encode()
-    return hashlib.md5(row_str).hexdigest()
+    if isinstance(row, pd.Series):
+        row = row.to_frame().T.infer_objects()
+    return int(_hash_rows(row)[0])
+
 
+def _get_pk_index(df, pk):
+    """Get an index with the primary key of every row, without copying the frame.
 
-def drop_redundant(df, name, output_dir, pk=[], updated_flag=False):
+    Parameters
+    ----------
+    df: pd.DataFrame
+        The dataframe with the primary key columns.
+    pk: list
+        Primary key column(s).
+
+    Returns
+    -------
+    return: pd.Index
+        An Index for a single primary key, a MultiIndex for composite keys.
+
+    """
+    if len(pk) == 1:
+        return pd.Index(df[pk[0]])
+    return pd.MultiIndex.from_arrays([df[col] for col in pk])
+
+
+def drop_redundant(
+    df,
+    name,
+    output_dir,
+    pk=[],
+    updated_flag=False,
+    fast_mode=False,
+    sample_size=1_000_000,
+):
     """Drop the rows that were present in previous versions of the dataframe.
 
     Notes
@@ -236,6 +776,9 @@ def drop_redundant(df, name, output_dir, pk=[], updated_flag=False):
     This function will create a hash for every row of the dataframe and snapshot it, if
     the same row was present in previous versions of the dataframe, it will be dropped.
 
+    With ``fast_mode`` a single digest of (a sample of) the dataframe is snapshotted
+    instead, and the whole dataframe is dropped if it matches the previous digest.
+
     Parameters
     ----------
     df: pd.DataFrame
@@ -249,6 +792,12 @@ def drop_redundant(df, name, output_dir, pk=[], updated_flag=False):
     updated_flag: bool
         To create of not a column with a flag for new/updated rows for the given
         primary key.
+    fast_mode: bool
+        Only check if the dataframe changed since the previous version, pk and
+        updated_flag are not used.
+    sample_size: int
+        Maximum number of rows used to create the digest in fast mode, changes
+        outside of the sampled rows are not detected.
 
     Returns
     -------
@@ -256,36 +805,108 @@ def drop_redundant(df, name, output_dir, pk=[], updated_flag=False):
         Dataframe with the data after dropping the redundant rows.
 
     """
-    df = df.copy()
+    if fast_mode:
+        return drop_unchanged(df, name, output_dir, sample_size)
+
+    if not pk:
+        pk = []
+    elif isinstance(pk, str):
+        pk = [pk]
+    else:
+        pk = list(pk)
 
     if pk:
         # PK needs to be unique, so we drop the duplicated values
         df = df.drop_duplicates(subset=pk)
+    else:
+        # The caller's dataframe is never returned, even if no rows are dropped
+        df = df.copy(deep=False)
 
-    df["hash"] = df.apply(get_row_hash, axis=1)
+    row_hash = _hash_rows(df)
     # If there is a snapshot file compare and filter the hashs
-    if os.path.isfile(f"{output_dir}/{name}.hash.snapshot.csv"):
-        pk = [pk] if not isinstance(pk, list) else pk
+    hash_file = f"{output_dir}/{name}.hash.snapshot.parquet"
+    legacy_hash_file = f"{output_dir}/{name}.hash.snapshot.csv"
+    if not os.path.isfile(hash_file) and os.path.isfile(legacy_hash_file):
+        hash_df = pd.read_csv(legacy_hash_file)
+
+        # Snapshots written by older versions store md5 digests that can't be
+        # compared with the new hashes, so only the primary keys are kept
+        if not pd.api.types.is_integer_dtype(hash_df["hash"]):
+            hash_df["hash"] = 0
+        hash_df["hash"] = hash_df["hash"].astype("uint64")
+        write_snapshot(hash_df, f"{name}.hash", output_dir, use_parquet=True)
+
+    if os.path.isfile(hash_file):
+        # The snapshot is unique by PK, so it is used as is
+        hash_df = _read_parquet(hash_file, columns=pk + ["hash"])
+
+        # The PK columns are part of the hashed rows, so a single hashtable
+        # lookup of the hashes matches both the PK and the values
+        mask = ~pd.Index(row_hash).isin(hash_df["hash"].to_numpy(dtype="uint64"))
+        if updated_flag and pk:
+            updated = _get_pk_index(df, pk).isin(_get_pk_index(hash_df, pk))
 
-        hash_df = pd.read_csv(f"{output_dir}/{name}.hash.snapshot.csv")
+        df = df.loc[mask]
+        row_hash = row_hash[mask]
+        if updated_flag and pk:
+            df = df.assign(_updated=updated[mask])
+
+    # Without a PK the hash itself identifies the rows in the snapshot
+    hash_state = pd.DataFrame(
+        {**{col: df[col].to_numpy() for col in pk}, "hash": row_hash}
+    )
+    snapshot_records(
+        hash_state,
+        f"{name}.hash",
+        output_dir,
+        pk or ["hash"],
+        use_parquet=True,
+    )
+    return df
 
-        if pk:
-            hash_df = hash_df.drop_duplicates(subset=pk)
 
-        if updated_flag and pk:
-            updated_pk = df[pk]
-            updated_pk["_updated"] = updated_pk.isin(hash_df[pk])
+def drop_unchanged(df, name, output_dir, sample_size=1_000_000):
+    """Drop all the rows if the dataframe is the same as its previous version.
 
-        df = df.merge(
-            hash_df[pk + ["hash"]], on=pk + ["hash"], how="left", indicator=True
-        )
-        df = df[df["_merge"] == "left_only"]
-        df = df.drop("_merge", axis=1)
-        df = df.merge(updated_pk, on=pk, how="left")
+    Parameters
+    ----------
+    df: pd.DataFrame
+        The dataframe do be checked.
+    name: str
+        The name used to snapshot the digest.
+    output_dir: str
+        The snapshot directory to save the state in.
+    sample_size: int
+        Maximum number of rows used to create the digest.
 
-    snapshot_records(df[pk + ["hash"]], f"{name}.hash", output_dir, pk)
-    df = df.drop("hash", axis=1)
-    return df
+    Returns
+    -------
+    return: pd.DataFrame
+        Empty dataframe if the data didn't change, else the whole dataframe.
+
+    """
+    if len(df) > sample_size:
+        df_sample = df.sample(sample_size, random_state=0)
+    else:
+        df_sample = df
+    # The row hashes are digested in order, unlike a sum it detects reordered values
+    row_hash = _hash_rows(df_sample)
+    # Renaming a column doesn't change the row hashes, so the names are digested too,
+    # separated by a null byte that can't be part of the JSON encoded names
+    columns = json.dumps([str(col) for col in df.columns]).encode()
+    digest = _get_digest(columns + b"\0" + row_hash.tobytes())
+
+    digest_file = f"{output_dir}/{name}.hash.digest"
+    previous_digest = None
+    if os.path.isfile(digest_file):
+        with open(digest_file) as f:
+            previous_digest = f.read().strip()
+    with open(digest_file, "w") as f:
+        f.write(digest)
+
+    if digest == previous_digest:
+        return df.iloc[:0]
+    return df.copy(deep=False)
 
 
 class Reader:
@@ -308,8 +929,13 @@ class Reader:
         self.root = root
         self.dir = dir
         self.input_files = self.read_directories()
+        self._parquet_files = {}
+        self._parquet_sources = []
+        self._catalog = None
+        self._headers_cache = {}
 
-    def __dict__(self):
+    def as_dict(self):
+        """Get the dict with the name of the streams and their paths."""
         return self.input_files
 
     def __str__(self):
@@ -318,29 +944,108 @@ class Reader:
     def __repr__(self):
         return str(list(self.input_files.keys()))
 
-    def get(self, stream, default=None, catalog_types=False, **kwargs):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the parquet files opened by the reader."""
+        # ParquetFile can only be closed since pyarrow 10, so close the sources
+        for source in self._parquet_sources:
+            source.close()
+        self._parquet_sources.clear()
+        self._parquet_files.clear()
+
+    def get(self, stream, default=None, catalog_types=False, columns=None, **kwargs):
         """Read the selected file."""
         filepath = self.input_files.get(stream)
         if not filepath:
             return default
         if filepath.endswith(".parquet"):
-            return pd.read_parquet(filepath, use_nullable_dtypes=True, **kwargs)
+            if kwargs:
+                return _read_parquet(filepath, columns, **kwargs)
+            return _read_parquet(self._parquet_file(filepath), columns)
+        # Extra read_csv arguments are only supported by pandas
+        pandas_only = kwargs or columns is not None
+        kwargs = self._csv_params(stream, catalog_types, kwargs)
+        if pandas_only:
+            return pd.read_csv(filepath, usecols=columns, **kwargs)
+        return _read_csv(filepath, **kwargs)
+
+    def iter_batches(
+        self, stream, batch_size=65536, catalog_types=False, columns=None, **kwargs
+    ):
+        """Read the selected file in chunks.
+
+        Parameters
+        ----------
+        stream: str
+            The name of the stream.
+        batch_size: int
+            Maximum number of rows in each chunk.
+        catalog_types: bool
+            Use the catalog types for CSV files.
+        columns: list
+            If not None, only these columns will be read from the file.
+        **kwargs:
+            Additional arguments that are passed to pandas read_csv for CSV files.
+
+        Returns
+        -------
+        return: generator
+            Generator of pandas dataframes, nothing is yielded if the stream does not
+            exist.
+
+        """
+        filepath = self.input_files.get(stream)
+        if not filepath:
+            return
+        if filepath.endswith(".parquet"):
+            batches = self._parquet_file(filepath).iter_batches(
+                batch_size=batch_size,
+                columns=columns,
+                use_threads=True,
+                use_pandas_metadata=True,
+            )
+            for batch in batches:
+                yield batch.to_pandas(
+                    self_destruct=True,
+                    split_blocks=True,
+                    types_mapper=_NULLABLE_TYPES.get,
+                )
+            return
+        kwargs = self._csv_params(stream, catalog_types, kwargs)
+        with pd.read_csv(
+            filepath, chunksize=batch_size, usecols=columns, **kwargs
+        ) as reader:
+            yield from reader
+
+    def _csv_params(self, stream, catalog_types, kwargs):
+        """Add the catalog types to the read_csv arguments if requested."""
         catalog = self.read_catalog()
         if catalog and catalog_types:
             types_params = self.get_types_from_catalog(catalog, stream)
             kwargs.update(types_params)
-        return pd.read_csv(filepath, **kwargs)
+        return kwargs
 
     def get_metadata(self, stream):
         """Get metadata from parquet file."""
         file = self.input_files.get(stream)
         if file.endswith(".parquet"):
-            return {
-                k.decode(): v.decode()
-                for k, v in pq.read_metadata(file).metadata.items()
-            }
+            metadata = self._parquet_file(file).metadata.metadata or {}
+            return {k.decode(): v.decode() for k, v in metadata.items()}
         return {}
 
+    def _parquet_file(self, filepath):
+        """Get the opened parquet file, the footer is only parsed once per file."""
+        if filepath not in self._parquet_files:
+            source = pa.OSFile(filepath)
+            self._parquet_sources.append(source)
+            self._parquet_files[filepath] = _open_parquet(source)
+        return self._parquet_files[filepath]
+
     def read_directories(self, ignore=[]):
         """Read all the available directories for input files.
 
@@ -359,35 +1064,29 @@ class Reader:
         all_files = []
         results = {}
         if is_directory:
-            for entry in os.listdir(self.dir):
-                file_path = os.path.join(self.dir, entry)
-                if os.path.isfile(file_path):
-                    if file_path.endswith(".csv") or file_path.endswith(".parquet"):
-                        all_files.append(file_path)
+            with os.scandir(self.dir) as entries:
+                all_files = [
+                    entry.path
+                    for entry in entries
+                    if entry.is_file() and entry.name.endswith((".csv", ".parquet"))
+                ]
         else:
             all_files.append(self.dir)
 
-        for file in all_files:
-            split_path = file.split("/")
-            entity_type = split_path[len(split_path) - 1].rsplit(".", 1)[0]
-
-            if "-" in entity_type:
-                entity_type = entity_type.rsplit("-", 1)[0]
-
+        for file, entity_type in zip(all_files, get_entity_names(all_files)):
             if entity_type not in results and entity_type not in ignore:
                 results[entity_type] = file
 
         return results
 
     def read_catalog(self):
-        """Read the catalog.json file."""
-        filen_name = f"{self.root}/catalog.json"
-        if os.path.isfile(filen_name):
-            with open(filen_name) as f:
-                catalog = json.load(f)
-        else:
-            catalog = None
-        return catalog
+        """Read the catalog.json file, it is only loaded once."""
+        if self._catalog is None:
+            filen_name = f"{self.root}/catalog.json"
+            if os.path.isfile(filen_name):
+                with open(filen_name) as f:
+                    self._catalog = json.load(f)
+        return self._catalog
 
     def get_types_from_catalog(self, catalog, stream):
         """Get the pandas types base on the catalog definition.
@@ -405,8 +1104,7 @@ class Reader:
             Dict with arguments to be used by pandas.
 
         """
-        filepath = self.input_files.get(stream)
-        headers = pd.read_csv(filepath, index_col=0, nrows=0).columns.tolist()
+        headers = self._headers(self.input_files.get(stream))
 
         streams = next(c for c in catalog["streams"] if c["stream"] == stream)
         types = streams["schema"]["properties"]
@@ -429,3 +1127,17 @@ class Reader:
             dtype[col] = "object"
 
         return dict(dtype=dtype, parse_dates=parse_dates)
+
+    def _headers(self, filepath):
+        """Get the column names of a file, the header is only read once per file."""
+        if filepath not in self._headers_cache:
+            # Only the header is needed, so the schema is read without pandas
+            if filepath.endswith(".parquet"):
+                headers = self._parquet_file(filepath).schema_arrow.names
+            else:
+                with open(filepath, "rb") as f:
+                    headers = pcsv.open_csv(
+                        f, parse_options=pcsv.ParseOptions(newlines_in_values=True)
+                    ).schema.names
+            self._headers_cache[filepath] = headers
+        return list(self._headers_cache[filepath])
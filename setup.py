@@ -16,6 +16,9 @@ setup(
         "pandas>=1.2.5",
         "pyarrow>=8.0.0",
     ],
+    extras_require={
+        "fast": ["numba>=0.53.0"],
+    },
     author="hotglue",
     author_email="hello@hotglue.xyz",
     license="MIT",
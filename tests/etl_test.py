@@ -1,6 +1,8 @@
+import json
 import os
 
 import gluestick
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -120,3 +122,415 @@ class TestETL(object):
         assert transformed_df.equals(expected_df)
 
         print("test_explode_multi output is correct")
+
+    def test_drop_redundant(self, tmp_path):
+        print("=====")
+        print("test_drop_redundant")
+
+        df = pd.DataFrame({"id": [1, 2, 3], "name": ["a", "b", "c"]})
+        df2 = gluestick.drop_redundant(df, "stream", str(tmp_path), "id")
+        assert df2.equals(df)
+        assert (tmp_path / "stream.hash.snapshot.parquet").is_file()
+
+        # Unchanged rows are dropped, changed and new rows are kept
+        df = pd.DataFrame({"id": [1, 2, 4], "name": ["a", "B", "d"]})
+        df2 = gluestick.drop_redundant(
+            df, "stream", str(tmp_path), "id", updated_flag=True
+        )
+        assert df2["id"].tolist() == [2, 4]
+        assert df2["_updated"].tolist() == [True, False]
+
+        # Running again with the same data drops everything
+        df2 = gluestick.drop_redundant(df, "stream", str(tmp_path), "id")
+        assert df2.empty
+        print("test_drop_redundant output is correct")
+
+    def test_drop_redundant_nested(self, tmp_path):
+        print("=====")
+        print("test_drop_redundant_nested")
+
+        df = pd.DataFrame({"id": [1, 2], "lines": [[{"a": 1}], [{"a": 2}]]})
+        df2 = gluestick.drop_redundant(df, "stream", str(tmp_path), "id")
+        assert df2.equals(df)
+
+        df.at[1, "lines"] = [{"a": 3}]
+        df2 = gluestick.drop_redundant(df, "stream", str(tmp_path), "id")
+        assert df2["id"].tolist() == [2]
+
+        df2 = gluestick.drop_redundant(df, "nested", str(tmp_path), fast_mode=True)
+        assert len(df2) == 2
+
+        # The caller's dataframe is not returned when nothing is dropped
+        df2 = gluestick.drop_redundant(df, "no_pk", str(tmp_path))
+        assert df2.equals(df) and df2 is not df
+        df2 = gluestick.drop_redundant(df, "copy", str(tmp_path), fast_mode=True)
+        assert df2.equals(df) and df2 is not df
+        print("test_drop_redundant_nested output is correct")
+
+    def test_drop_redundant_fast_mode(self, tmp_path):
+        print("=====")
+        print("test_drop_redundant_fast_mode")
+
+        df = pd.DataFrame({"id": [1, 2, 3], "name": ["a", "b", "c"]})
+        df2 = gluestick.drop_redundant(df, "stream", str(tmp_path), fast_mode=True)
+        assert df2.equals(df)
+
+        # The same data is dropped, any change returns the whole dataframe
+        df2 = gluestick.drop_redundant(df, "stream", str(tmp_path), fast_mode=True)
+        assert df2.empty
+        df2 = gluestick.drop_redundant(
+            df.iloc[::-1], "stream", str(tmp_path), fast_mode=True
+        )
+        assert len(df2) == 3
+
+        # Renamed columns are detected
+        df = df.iloc[::-1]
+        gluestick.drop_redundant(df, "stream", str(tmp_path), fast_mode=True)
+        df2 = gluestick.drop_redundant(
+            df.rename(columns={"name": "title"}),
+            "stream",
+            str(tmp_path),
+            fast_mode=True,
+        )
+        assert len(df2) == 3
+
+        # The digest doesn't depend on the installed optional dependencies
+        digest = (tmp_path / "stream.hash.digest").read_text()
+        assert digest == "4f28fd91bf71e038fff6fcb473ffd060"
+        print("test_drop_redundant_fast_mode output is correct")
+
+    def test_get_row_hash(self, tmp_path):
+        print("=====")
+        print("test_get_row_hash")
+
+        df = pd.DataFrame({"id": [1, 2], "name": ["a", None], "amount": [1.5, np.nan]})
+        gluestick.drop_redundant(df, "stream", str(tmp_path), "id")
+        hash_df = pd.read_parquet(tmp_path / "stream.hash.snapshot.parquet")
+        expected = hash_df["hash"].tolist()
+
+        # The rows are hashed the same way as in drop_redundant
+        assert df.apply(gluestick.get_row_hash, axis=1).tolist() == expected
+        assert [gluestick.get_row_hash(df.iloc[[i]]) for i in range(2)] == expected
+        # The hash doesn't depend on the installed optional dependencies
+        assert gluestick.get_row_hash(df.iloc[0]) == 12654819748805422350
+        print("test_get_row_hash output is correct")
+
+    def test_hash_numeric_rows(self):
+        print("=====")
+        print("test_hash_numeric_rows")
+
+        df = pd.DataFrame(
+            {
+                "int8": np.array([1, -2, 3], dtype="int8"),
+                "float": [1.5, np.nan, -0.0],
+                "bool": [True, False, True],
+                "uint64": np.array([0, 2**64 - 1, 5], dtype="uint64"),
+            }
+        )
+        values = gluestick.etl_utils._numeric_values(df)
+        # Without numba the kernel runs as plain python with numpy scalars
+        with np.errstate(over="ignore"):
+            row_hash = gluestick.etl_utils._hash_numeric_rows(values)
+        expected = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        assert np.array_equal(row_hash, expected)
+        print("test_hash_numeric_rows output is correct")
+
+    def test_snapshot_records(self, tmp_path):
+        print("=====")
+        print("test_snapshot_records")
+
+        df = pd.DataFrame({"id": [1, 2], "name": ["a", "b"]})
+        gluestick.snapshot_records(df, "stream", str(tmp_path))
+
+        # Existing records are updated and new records are appended
+        df = pd.DataFrame({"id": [3, 1, 3], "name": ["c", "A", "C"]})
+        snapshot = gluestick.snapshot_records(df, "stream", str(tmp_path))
+        expected_df = pd.DataFrame({"id": [1, 2, 3], "name": ["A", "b", "C"]})
+        assert snapshot.equals(expected_df)
+        assert gluestick.read_snapshots("stream", str(tmp_path)).equals(expected_df)
+
+        # Unchanged records don't rewrite the snapshot
+        snapshot_file = tmp_path / "stream.snapshot.csv"
+        mtime = snapshot_file.stat().st_mtime_ns
+        snapshot = gluestick.snapshot_records(df.iloc[[1]], "stream", str(tmp_path))
+        assert snapshot.equals(expected_df)
+        assert snapshot_file.stat().st_mtime_ns == mtime
+
+        # CSV snapshots are written exactly like pandas to_csv
+        df = pd.DataFrame(
+            {"id": [1, 2], "name": ["a, b", None], "active": [True, False]}
+        )
+        gluestick.snapshot_records(df, "csv_format", str(tmp_path))
+        snapshot_file = tmp_path / "csv_format.snapshot.csv"
+        assert snapshot_file.read_text() == df.to_csv(index=False)
+
+        # Whole floats keep their dtype when the snapshot is read back
+        df = pd.DataFrame({"id": [1, 2], "amount": [1.0, 2.0]})
+        gluestick.snapshot_records(df, "floats", str(tmp_path))
+        snapshot_file = tmp_path / "floats.snapshot.csv"
+        mtime = snapshot_file.stat().st_mtime_ns
+        snapshot = gluestick.snapshot_records(df.iloc[[0]], "floats", str(tmp_path))
+        assert snapshot.equals(df)
+        assert snapshot_file.stat().st_mtime_ns == mtime
+
+        # Snapshots read back with other dtypes aren't rewritten by the same data
+        df = pd.DataFrame(
+            {
+                "id": [1, 2],
+                "name": ["a", None],
+                "count": pd.array([1, None], dtype="Int64"),
+                "created_at": pd.to_datetime(["2020-01-01T00:00:00Z", None]),
+            }
+        )
+        for use_parquet, extension in [(True, "parquet"), (False, "csv")]:
+            stream = f"typed_{extension}"
+            gluestick.snapshot_records(
+                df, stream, str(tmp_path), use_parquet=use_parquet
+            )
+            snapshot_file = tmp_path / f"{stream}.snapshot.{extension}"
+            mtime = snapshot_file.stat().st_mtime_ns
+            gluestick.snapshot_records(
+                df, stream, str(tmp_path), use_parquet=use_parquet
+            )
+            assert snapshot_file.stat().st_mtime_ns == mtime
+
+        # Snapshots are read back in the format they are written to
+        df = pd.DataFrame({"id": [1], "name": ["a"]})
+        gluestick.snapshot_records(df, "formats", str(tmp_path), use_parquet=True)
+        df = pd.DataFrame({"id": [2], "name": ["b"]})
+        gluestick.snapshot_records(df, "formats", str(tmp_path))
+        df = pd.DataFrame({"id": [3], "name": ["c"]})
+        snapshot = gluestick.snapshot_records(df, "formats", str(tmp_path))
+        assert snapshot["id"].tolist() == [1, 2, 3]
+
+        # The column order of the snapshot is kept
+        df = pd.DataFrame({"name": ["a"], "id": [1]})
+        gluestick.snapshot_records(df, "order", str(tmp_path))
+        df = pd.DataFrame({"id": [2], "name": ["b"], "code": ["x"]})
+        snapshot = gluestick.snapshot_records(df, "order", str(tmp_path))
+        assert snapshot.columns.tolist() == ["name", "id", "code"]
+        snapshot = gluestick.read_snapshots("order", str(tmp_path))
+        assert snapshot.columns.tolist() == ["name", "id", "code"]
+
+        # Duplicated keys in the first snapshot are dropped on update
+        df = pd.DataFrame({"id": [1, 1], "name": ["a", "b"]})
+        gluestick.snapshot_records(df, "dupes", str(tmp_path))
+        df = pd.DataFrame({"id": [2], "name": ["c"]})
+        snapshot = gluestick.snapshot_records(df, "dupes", str(tmp_path))
+        assert snapshot["id"].tolist() == [1, 2]
+        assert snapshot["name"].tolist() == ["b", "c"]
+        print("test_snapshot_records output is correct")
+
+    def test_read_parquet_folder(self, tmp_path):
+        print("=====")
+        print("test_read_parquet_folder")
+
+        df = pd.DataFrame({"id": [1, 2], "name": ["a", "b"]})
+        df.to_parquet(tmp_path / "Account-20200811T121507.parquet", index=False)
+        df.to_parquet(tmp_path / "Invoice-20200811T121507.parquet", index=False)
+
+        entity_data = gluestick.read_parquet_folder(
+            str(tmp_path), columns={"Invoice": ["id"]}
+        )
+        assert sorted(entity_data) == ["Account", "Invoice"]
+        assert entity_data["Account"].columns.tolist() == ["id", "name"]
+        assert entity_data["Invoice"].columns.tolist() == ["id"]
+        assert str(entity_data["Account"]["id"].dtype) == "Int64"
+        print("test_read_parquet_folder output is correct")
+
+    def test_read_csv_folder(self, tmp_path):
+        print("=====")
+        print("test_read_csv_folder")
+
+        df = pd.DataFrame({"id": [1, 2], "name": ["a", None]})
+        df.to_csv(tmp_path / "Account-20200811T121507.csv", index=False)
+        df.to_csv(tmp_path / "Invoice-20200811T121507.csv", index=False)
+
+        entity_data = gluestick.read_csv_folder(
+            str(tmp_path),
+            index_cols={"Account": "id"},
+            converters={"Invoice": {"name": str}},
+        )
+        assert entity_data["Account"].index.tolist() == [1, 2]
+        assert entity_data["Account"]["name"].isna().tolist() == [False, True]
+        assert entity_data["Invoice"]["name"].tolist() == ["a", ""]
+        print("test_read_csv_folder output is correct")
+
+    def test_read_csv(self, tmp_path):
+        print("=====")
+        print("test_read_csv")
+
+        files = [
+            "id,created_at,due_date,amount,empty\n"
+            "1,2020-01-01T00:00:00Z,2020-01-01,<NA>,\n"
+            "2,2020-01-02T00:00:00Z,2020-01-02,1.5,\n",
+            # Integers that don't fit in an int64
+            "id,amount\n18446744073709551615,1\n1,2\n",
+            "id,amount\n12345678901234567890123,1\n1,2\n",
+            # Blank and duplicated headers
+            ",id,name\n0,1,a\n1,2,b\n",
+            "id,name,name\n1,a,b\n",
+            # Header only
+            "id,name\n",
+            # Missing strings and booleans
+            "id,name,active\n1,a,True\n2,,\n",
+        ]
+        path = tmp_path / "Invoice.csv"
+        for text in files:
+            path.write_text(text)
+            for index_col in [None, False, 0]:
+                df = gluestick.etl_utils._read_csv(str(path), index_col=index_col)
+                expected = pd.read_csv(path, index_col=index_col)
+                assert df.equals(expected)
+                assert df.dtypes.equals(expected.dtypes)
+                assert df.columns.equals(expected.columns)
+                assert df.index.equals(expected.index)
+                # None and NaN are both null, so the values are compared by type
+                for col in df.columns:
+                    assert df[col].map(type).equals(expected[col].map(type))
+
+        df = gluestick.etl_utils._read_csv(str(path))
+        assert (df["name"] != df["name"]).tolist() == [False, True]
+        print("test_read_csv output is correct")
+
+    def test_reader(self, tmp_path):
+        print("=====")
+        print("test_reader")
+
+        df = pd.DataFrame({"id": [1, 2], "name": ["a", "b"]})
+        df.to_parquet(tmp_path / "Account-20200811T121507.parquet", index=False)
+        df.to_csv(tmp_path / "Invoice-20200811T121507.csv", index=False)
+
+        reader = gluestick.Reader(str(tmp_path), str(tmp_path))
+        assert sorted(reader.as_dict()) == ["Account", "Invoice"]
+        assert "input_files" in vars(reader)
+        assert reader.get("Account")["name"].tolist() == ["a", "b"]
+        assert reader.get("Account", columns=["id"]).columns.tolist() == ["id"]
+        filtered_df = reader.get("Account", filters=[("id", "=", 2)], engine="pyarrow")
+        assert filtered_df["name"].tolist() == ["b"]
+        assert reader.get("Invoice").equals(df)
+        assert "pandas" in reader.get_metadata("Account")
+        assert reader.get("Missing") is None
+
+        for stream in ["Account", "Invoice"]:
+            batches = list(reader.iter_batches(stream, batch_size=1))
+            assert [len(batch) for batch in batches] == [1, 1]
+            assert pd.concat(batches)["name"].tolist() == ["a", "b"]
+
+        # Closing the reader releases the opened parquet files
+        with gluestick.Reader(str(tmp_path), str(tmp_path)) as reader:
+            assert reader.get("Account").equals(reader.get("Account"))
+            assert len(reader._parquet_files) == 1
+            sources = list(reader._parquet_sources)
+        assert not reader._parquet_files
+        assert all(source.closed for source in sources)
+        assert reader.get("Account")["name"].tolist() == ["a", "b"]
+        reader.close()
+        print("test_reader output is correct")
+
+    def test_reader_catalog_types(self, tmp_path):
+        print("=====")
+        print("test_reader_catalog_types")
+
+        df = pd.DataFrame(
+            {
+                "id": [1, 2],
+                "amount": [1, None],
+                "created_at": ["2020-01-01T00:00:00Z", "2020-01-02T00:00:00Z"],
+                "paid_at": ["2020-01-01T00:00:00Z", "unknown"],
+                "code": ["001", "002"],
+            }
+        )
+        df.to_csv(tmp_path / "Invoice-20200811T121507.csv", index=False)
+        properties = {
+            "id": {"type": ["integer"]},
+            "amount": {"type": ["null", "integer"]},
+            "created_at": {"type": ["null", "string"], "format": "date-time"},
+            "paid_at": {"type": ["null", "string"], "format": "date-time"},
+            "code": {"type": ["null", "string"]},
+        }
+        catalog = {
+            "streams": [{"stream": "Invoice", "schema": {"properties": properties}}]
+        }
+        with open(tmp_path / "catalog.json", "w") as f:
+            json.dump(catalog, f)
+
+        reader = gluestick.Reader(str(tmp_path), str(tmp_path))
+        df2 = reader.get("Invoice", catalog_types=True)
+        assert str(df2["id"].dtype) == "Int64"
+        assert str(df2["amount"].dtype) == "Int64"
+        assert str(df2["created_at"].dtype) == "datetime64[ns, UTC]"
+        # Dates that can't be parsed are kept as strings
+        assert df2["paid_at"].tolist() == ["2020-01-01T00:00:00Z", "unknown"]
+        assert df2["code"].tolist() == ["001", "002"]
+
+        # The types follow the given catalog and can be changed by the caller
+        types = reader.get_types_from_catalog(catalog, "Invoice")
+        types["dtype"]["id"] = "object"
+        types["parse_dates"].clear()
+        assert (
+            reader.get_types_from_catalog(catalog, "Invoice")["dtype"]["id"] == "Int64"
+        )
+        properties["id"] = {"type": ["null", "string"]}
+        types = reader.get_types_from_catalog(catalog, "Invoice")
+        assert types["dtype"]["id"] == "object"
+        assert types["parse_dates"] == ["created_at", "paid_at"]
+        print("test_reader_catalog_types output is correct")
+
+    def test_reader_csv_matches_pandas(self, tmp_path):
+        print("=====")
+        print("test_reader_csv_matches_pandas")
+
+        files = {
+            "Account": ",id,name,active\n0,1,a,True\n1,2,,\n",
+            "Invoice": "id,name,amount,created_at\n"
+            "1,a,1.5,2020-01-01T00:00:00Z\n2,,,\n",
+            "Ids": "id,name\n18446744073709551615,a\n1,b\n",
+            "Empty": "id,name,amount\n",
+        }
+        properties = {
+            "id": {"type": ["integer"]},
+            "name": {"type": ["null", "string"]},
+            "active": {"type": ["null", "boolean"]},
+            "amount": {"type": ["null", "number"]},
+            "created_at": {"type": ["null", "string"], "format": "date-time"},
+        }
+        catalog = {"streams": []}
+        for stream, text in files.items():
+            (tmp_path / f"{stream}-20200811T121507.csv").write_text(text)
+            schema = {"properties": dict(properties)}
+            if stream == "Ids":
+                schema["properties"]["id"] = {"type": ["string"]}
+            catalog["streams"].append({"stream": stream, "schema": schema})
+        with open(tmp_path / "catalog.json", "w") as f:
+            json.dump(catalog, f)
+
+        reader = gluestick.Reader(str(tmp_path), str(tmp_path))
+        for stream in files:
+            path = reader.input_files[stream]
+            types = reader.get_types_from_catalog(catalog, stream)
+            for df, expected in [
+                (reader.get(stream), pd.read_csv(path)),
+                (reader.get(stream, catalog_types=True), pd.read_csv(path, **types)),
+            ]:
+                assert df.equals(expected)
+                assert df.dtypes.equals(expected.dtypes)
+                assert df.columns.equals(expected.columns)
+                # None and NaN are both null, so the values are compared by type
+                for col in df.columns:
+                    assert df[col].map(type).equals(expected[col].map(type))
+        print("test_reader_csv_matches_pandas output is correct")
+
+    def test_get_entity_names(self):
+        print("=====")
+        print("test_get_entity_names")
+
+        files = [
+            "sync-output/Account-20200811T121507.csv",
+            "sync-output/sales-orders-20200811T121507.parquet",
+            "Invoice.csv",
+            "Invoice.v2-20200811T121507.csv",
+        ]
+        entity_names = gluestick.get_entity_names(files)
+        assert entity_names == ["Account", "sales-orders", "Invoice", "Invoice.v2"]
+        print("test_get_entity_names output is correct")